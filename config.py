@@ -10,6 +10,9 @@ from utils import to_form_url
 
 @dataclass
 class EntryInfo:
+    # Written out by hand as dataclass(slots=True) needs Python 3.10
+    __slots__ = ("required", "prompt", "type", "key", "title", "value")
+
     required: bool
     prompt: bool
     type: str
@@ -50,45 +53,60 @@ class EntryInfo:
         if not string:
             raise ValueError("Empty entry")
         required = (string[0] == "*")
-        string = string.removeprefix("*").strip()
+        if required:
+            string = string[1:].lstrip()  # Already stripped on the right
 
         if not string:
             raise ValueError("Missing type")
         prompt = (string[0] == "!")
-        string = string.removeprefix("!").strip()
-
-        type, split, string = map(str.strip, string.partition("-"))
-        for name, aliases in cls.TYPES.items():
-            if type == name:
-                break
-            elif type in aliases:
-                type = name
-                break
-        else:
+        if prompt:
+            string = string[1:].lstrip()
+
+        # Each part is sliced out up to its separator (found with str.find)
+        # instead of partitioning and stripping every piece.
+        split = string.find("-")
+        end = len(string) if split == -1 else split
+        type = string[:end].rstrip()
+        if type not in TYPE_ALIASES:
             raise ValueError(f"Type not valid: {type}")
-        if not split:
+        type = TYPE_ALIASES[type]
+        if split == -1:
             raise ValueError("Missing type-key split '-'")
+        start = split + 1
 
-        key, split, string = map(str.strip, string.partition(";"))
+        split = string.find(";", start)
+        end = len(string) if split == -1 else split
+        key = string[start:end].strip()
         if not key:
             raise ValueError("Missing key")
-        if not split:
+        if split == -1:
             raise ValueError("Missing key-title split ';'")
+        start = split + 1
 
-        title, split, value = map(str.strip, string.partition("="))
+        split = string.find("=", start)
+        end = len(string) if split == -1 else split
+        title = string[start:end].strip()
         if not title:
             title = key  # Title defaults to the key if absent.
-        if not split:
+        if split == -1:
             raise ValueError("Missing title-value split '='")
+        value = string[split + 1:].strip()
 
         return cls(required, prompt, type, key, title, value)
 
     def __str__(self):
         return (
-            f"{'*'*self.required}{'!'*self.prompt}{self.type}"
-            f"-{self.key};{self.title}={self.value}"
+            f"{'*' if self.required else ''}{'!' if self.prompt else ''}"
+            f"{self.type}-{self.key};{self.title}={self.value}"
         )
 
+# Map of each type name and alias to its type name
+TYPE_ALIASES = {
+    alias: name
+    for name, aliases in EntryInfo.TYPES.items()
+    for alias in [name, *aliases]
+}
+
 ConfigInfo = namedtuple("ConfigInfo", "url entries")
 def open_config(file):
     """
@@ -97,15 +115,17 @@ def open_config(file):
     if isinstance(file, str):
         file = open(file)
     with file:
-        url = to_form_url(file.readline())
-        entries = []
-        for line in file:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith("#"):
-                continue
-            entries.append(EntryInfo.from_string(line))
+        text = file.read()  # Read it all at once (faster than line by line)
+    url_line, _, rest = text.partition("\n")
+    url = to_form_url(url_line)
+    entries = []
+    for line in rest.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            continue
+        entries.append(EntryInfo.from_string(line))
     return ConfigInfo(url, entries)
 
 # - Tests
@@ -122,6 +142,10 @@ def test_entry_from_string():
     assert EntryInfo.from_string("word-key;=") == b
     assert EntryInfo.from_string("text-key;=") == b
 
+    # Only the first separator of each kind splits the line
+    c = EntryInfo(False, False, "choice", "a-b", "x;y", "1=2")
+    assert EntryInfo.from_string("multiple choice - a-b ; x;y = 1=2 ") == c
+
 def test_entry_str():
     entry = EntryInfo(True, True, "words", "key", "title", "value")
     assert EntryInfo.from_string(str(entry)) == entry
@@ -129,3 +153,8 @@ def test_entry_str():
     line = "*!words-key;title=value"
     assert str(entry) == line
     assert str(EntryInfo.from_string(line)) == line
+
+def test_type_aliases():
+    # Each alias should only belong to one type
+    names = [*EntryInfo.TYPES, *sum(EntryInfo.TYPES.values(), [])]
+    assert len(names) == len(TYPE_ALIASES)
@@ -3,38 +3,71 @@
 # This module holds functions for converting a form. This includes CSS
 # selectors and JSON extraction.
 
-import json
+import re
+
+from html import unescape
+from importlib.util import find_spec
+
+# Comes with beautifulsoup4 (this module is only imported when converting)
+from soupsieve import compile as compile_selector
 
 from config import EntryInfo
 from utils import to_form_url, to_normal_form_url
 
+# Use lxml for parsing the HTML if it's installed (it's much faster)
+HTML_PARSER = "lxml" if find_spec("lxml") else "html.parser"
+
 # Constant freebird component class prefix
 FREEBIRD = "freebirdFormviewerComponentsQuestion"
 
 # - CSS Selectors
 
-# Get form info using CSS selectors
+# Selectors are compiled once here
+SELECTORS = {
+    "question": compile_selector(f"div.{FREEBIRD}BaseRoot"),
+    "email": compile_selector(f"div.{FREEBIRD}BaseRoot input[type=email]"),
+    "header": compile_selector(f"div.{FREEBIRD}BaseHeader"),
+    "required": compile_selector(f"span.{FREEBIRD}BaseRequiredAsterisk"),
+    "radio": compile_selector(f"div.{FREEBIRD}RadioChoice"),
+    "checkbox": compile_selector(f"div.{FREEBIRD}CheckboxChoice"),
+    "select": compile_selector("div.appsMaterialWizMenuPaperselectOption"),
+}
+
+# Get form info using CSS selectors (only what the JSON data doesn't have)
 def info_using_soup(soup):
+    return {
+        "form_url": to_form_url(soup.form["action"]),
+        "takes_email": form_takes_email(soup.form),
+    }
+
+# Get question info using CSS selectors. The JSON data has all of this and is
+# much faster to read, so this is only used to check info_using_json.
+def questions_using_soup(soup):
     questions = form_questions(soup.form)
-    takes_email = form_takes_email(soup.form)
-    if takes_email:
+    if form_takes_email(soup.form):
         questions.pop(0)  # Remove first question (email)
+    types, titles, required, options = [], [], [], []
+    for question in questions:
+        type = question_type(question)
+        types.append(type)
+        titles.append(question_title(question))
+        required.append(question_required(question))
+        # Pass the type so it isn't found again
+        options.append(question_options(question, type))
     return {
-        "form_url": to_form_url(soup.form["action"]),
-        "types": list(map(question_type, questions)),
-        "titles": list(map(question_title, questions)),
-        "required": list(map(question_required, questions)),
-        "options": list(map(question_options, questions)),
-        "takes_email": takes_email,
+        "types": types,
+        "titles": titles,
+        "required": required,
+        "options": options,
     }
 
 # Get the question root div (ignores non-question types)
 def form_questions(form):
-    return form.select(f"div.{FREEBIRD}BaseRoot")
+    return SELECTORS["question"].select(form)
 
 # Return whether the form takes an x-emailAddress
 def form_takes_email(form):
-    return bool(form.select_one(f"div.{FREEBIRD}BaseRoot input[type=email]"))
+    return bool(SELECTORS["email"].select_one(form))
 
 # Each type has their unique question classes
 QUESTION_CLASSES = {
@@ -44,22 +77,31 @@ QUESTION_CLASSES = {
     "date": ["DateDateInputs"],
     "time": ["TimeRoot"],
 }
+# Map of each full question class to its type. One selector matches them all
+# and the type is found from the matched div's class.
+QUESTION_TYPES = {
+    f"{FREEBIRD}{class_}": type
+    for type, classes in QUESTION_CLASSES.items()
+    for class_ in classes
+}
+QUESTION_SELECTOR = compile_selector(
+    ", ".join(f"div.{class_}" for class_ in QUESTION_TYPES)
+)
 def question_type(question):
-    for type, classes in QUESTION_CLASSES.items():
-        for class_ in classes:
-            if question.select_one(f"div.{FREEBIRD}{class_}"):
-                return type
-    else:
-        raise ValueError("Unknown type of question")
+    if div := QUESTION_SELECTOR.select_one(question):
+        for class_ in div["class"]:
+            if class_ in QUESTION_TYPES:
+                return QUESTION_TYPES[class_]
+    raise ValueError("Unknown type of question")
 
 # Get the question title
 def question_title(question):
-    # .strings returns two strings: ["Question", "*" if required]
-    return list(question.select_one(f"div.{FREEBIRD}BaseHeader").strings)[0]
+    # .strings yields two strings: "Question", "*" if required
+    return next(SELECTORS["header"].select_one(question).strings)
 
 # Return whether the question is required
 def question_required(question):
-    return bool(question.select_one(f"span.{FREEBIRD}BaseRequiredAsterisk"))
+    return bool(SELECTORS["required"].select_one(question))
 
 # Get the options, returning None if not applicable
 def question_options(question, type=None):
@@ -68,48 +110,122 @@ def question_options(question, type=None):
     if type not in {"choice", "checkboxes"}:
         return None
 
-    if options := question.select(f"div.{FREEBIRD}RadioChoice"):
+    if options := SELECTORS["radio"].select(question):
         return [choice.text for choice in options]
-    if options := question.select(f"div.{FREEBIRD}CheckboxChoice"):
+    if options := SELECTORS["checkbox"].select(question):
         return [choice.text for choice in options]
-    if options := question.select("div.appsMaterialWizMenuPaperselectOption"):
+    if options := SELECTORS["select"].select(question):
         # Remove the first choice (the "Choose" placeholder)
-        return [choice.text for choice in options][1:]
+        return [choice.text for choice in options[1:]]
 
     raise ValueError("Cannot find question's options")
 
 # - JSON Data
 
-# Return script's JSON
+# Parse a JSON string (imported here as only conversion needs it)
+def json_loads(string):
+    try:
+        from orjson import loads  # Faster but optional
+    except ImportError:
+        from json import loads
+    return loads(string)
+
+# Return script's JSON (cached on the soup as it can be large)
 def form_json_data(soup):
+    if (cached := vars(soup).get("_form_json_data")) is not None:
+        return cached
     # This returns `JSON` from a string with this format:
     #   var FB_PUBLIC_LOAD_DATA_ = JSON;
-    script = soup.select("body>script")[0].string
-    data = script.partition("=")[2].rstrip().removesuffix(";")
-    return json.loads(data)
+    script = soup.body.find("script", recursive=False).string
+    # Slice the JSON out in one go as the script can be large. (Whitespace
+    # around it is ignored by the JSON parser.)
+    start = script.find("=") + 1
+    end = script.rfind(";")
+    if end < start or script[end + 1:].strip():
+        end = None  # The script doesn't end with a semicolon
+    soup._form_json_data = json_loads(script[start:end])
+    return soup._form_json_data
+
+# Question type numbers used in the JSON data (see QUESTION_CLASSES)
+JSON_TYPES = {
+    0: "words",  # Short answer
+    1: "words",  # Paragraph
+    2: "choice",  # Multiple choice
+    3: "choice",  # Dropdown
+    4: "checkboxes",
+    9: "date",
+    10: "time",
+}
 
 # Get form info using JS script
 def info_using_json(json):
     # Note that most of these were found by matching up strings with the form.
-    # They can probably change and so should only be used when necessary (such
-    # as for the entry keys).
-    questions = json[1][1]
-    def get_options(question):
-        if options := question[4][0][1]:
-            return [option[0] for option in options]
-        return None
+    # They can probably change, so test_info_soup_css checks them against the
+    # CSS selectors.
+    types, titles, keys, required, options = [], [], [], [], []
+    for question in json[1][1]:
+        if question[3] not in JSON_TYPES:
+            raise ValueError("Unknown type of question")
+        types.append(JSON_TYPES[question[3]])
+        titles.append(question[1])
+        # Holds the key, the options, and whether it's required
+        entry = question[4][0]
+        keys.append(entry[0])
+        required.append(bool(entry[2]))
+        if entry[1]:
+            options.append([option[0] for option in entry[1]])
+        else:
+            options.append(None)
     return {
         "form_title": json[1][8],
         "form_description": json[1][0] or "",  # Can be None
-        "titles": [question[1] for question in questions],
-        "keys": [question[4][0][0] for question in questions],
-        "required": [bool(question[4][0][2]) for question in questions],
-        "options": [get_options(question) for question in questions],
+        "types": types,
+        "titles": titles,
+        "keys": keys,
+        "required": required,
+        "options": options,
+    }
+
+# - Raw HTML
+
+# Patterns for the info that info_using_soup finds (and the script's JSON)
+HTML_PATTERNS = {
+    "form_url": re.compile(r"""<form\b[^>]*?\baction=(["'])(?P<url>.*?)\1"""),
+    # Not preceded by "-" so attributes like data-type don't match
+    "email": re.compile(
+        r"""<input\b[^>]*?(?<![\w-])type\s*=\s*(["']?)email\1[\s/>]""",
+        re.IGNORECASE,
+    ),
+    "json": re.compile(
+        r"var FB_PUBLIC_LOAD_DATA_\s*=\s*(?P<json>.*?);?\s*</script>",
+        re.DOTALL,
+    ),
+}
+
+# Get form info straight from the HTML text, skipping the slow HTML parsing.
+# Return None if the info can't be found this way. (Use form_info instead.)
+def form_info_from_html(text):
+    url_match = HTML_PATTERNS["form_url"].search(text)
+    json_match = HTML_PATTERNS["json"].search(text)
+    if not url_match or not json_match:
+        return None
+    # Only look for the email input inside the form (like form_takes_email)
+    form_end = text.find("</form>", url_match.end())
+    if form_end == -1:
+        return None
+    email_pattern = HTML_PATTERNS["email"]
+    email_match = email_pattern.search(text, url_match.end(), form_end)
+    info = {
+        # Entities like &amp; are decoded by the soup so do the same here
+        "form_url": to_form_url(unescape(url_match["url"])),
+        "takes_email": bool(email_match),
     }
+    return info | info_using_json(json_loads(json_match["json"]))
 
 # - Form Info
 
 # Return a union of info_using_json and info_using_soup
+# (The questions come from the JSON data.)
 def form_info(soup):
     return info_using_soup(soup) | info_using_json(form_json_data(soup))
 
@@ -162,10 +278,55 @@ def test_info_soup_css():
     url = to_form_url(form_id)
 
     response = requests.get(url)
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = BeautifulSoup(response.text, HTML_PARSER)
 
-    info_soup = info_using_soup(soup)
+    info_soup = questions_using_soup(soup)
     info_json = info_using_json(form_json_data(soup))
 
     for key in info_soup.keys() & info_json.keys():
         assert info_soup[key] == info_json[key]
+
+# Test that the info found without parsing the HTML is the same
+def test_info_from_html():
+    import requests
+    from bs4 import BeautifulSoup
+
+    form_id = "1FAIpQLSfWiBiihYkMJcZEAOE3POOKXDv6p4Ox4rX_ZRsQwu77aql8kQ"
+    url = to_form_url(form_id)
+
+    response = requests.get(url)
+    soup = BeautifulSoup(response.text, HTML_PARSER)
+
+    assert form_info_from_html(response.text) == form_info(soup)
+
+# Test the HTML patterns against the soup offline (with an email input outside
+# of the form that shouldn't be counted and an entity in the form action)
+def test_html_patterns():
+    from bs4 import BeautifulSoup
+
+    form_id = "1FAIpQLSfWiBiihYkMJcZEAOE3POOKXDv6p4Ox4rX_ZRsQwu77aql8kQ"
+    json = (
+        '[null, ["Description", [[1, "Name", null, 0, [[1000, null, 1]]], '
+        '[2, "Color", null, 2, [[1001, [["Red"], ["Blue"]], 0]]]], '
+        'null, null, null, null, null, null, "Title"]]'
+    )
+    form_url = to_form_url(form_id)
+    action = form_url.replace("/formResponse", "&#47;formResponse")
+    for email, takes_email in [
+        ('<input type="email">', True),
+        ('<INPUT TYPE="email">', True),
+        ('<input data-type="email">', False),
+        ("", False),
+    ]:
+        text = (
+            f'<html><body><div><form action="{action}">'
+            f'<div class="{FREEBIRD}BaseRoot">{email}</div>'
+            '</form><footer><input type="email"></footer></div>'
+            f"<script>var FB_PUBLIC_LOAD_DATA_ = {json};</script>"
+            "</body></html>"
+        )
+        soup = BeautifulSoup(text, HTML_PARSER)
+        info = form_info_from_html(text)
+        assert info == form_info(soup)
+        assert info["form_url"] == form_url
+        assert info["takes_email"] == takes_email
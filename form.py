@@ -1,48 +1,79 @@
+import os
 import sys
 import traceback
 
-from argparse import ArgumentParser
-from configparser import Error as ConfigError
 from contextlib import suppress
+from functools import cache, lru_cache
 
 from config import open_config
-from convert import form_info, config_lines_from_info
 from process import prompt_entry, parse_entries, format_entries
 from utils import to_form_url, url_from_shortcut
 
-# Better parser that allows you to specify converter origin type.
-# (Whether it's a file or a shortcut)
-parser = ArgumentParser(description="Automate Google Forms")
-subparsers = parser.add_subparsers(dest="command", required=True,
-    description="All commands form.py supports")
-
-# form process ...
-processor = subparsers.add_parser("process", aliases=["p"],
-    help="process config file and send form response",
-    description="Process config file and send form response")
-processor.add_argument("target", default="config.txt", nargs="?",
-    help="file to use process config from")
-
-# form convert ...
-converter = subparsers.add_parser("convert", aliases=["c"],
-    help="convert form into config file",
-    description="Convert form into config file")
-converter.add_argument("origin",
-    help="origin file / url to convert from")
-converter.add_argument("target", default="config.txt", nargs="?",
-    help="target file to write converted config to")
-
-# form convert --...
-modes = converter.add_mutually_exclusive_group()
-modes.add_argument("-u", "--url", const="url",
-    dest="mode", action="store_const",
-    help="assume origin is a url")
-modes.add_argument("-f", "--file",  const="file",
-    dest="mode", action="store_const",
-    help="assume origin is an html file")
-modes.add_argument("-s", "--shortcut", const="shortcut",
-    dest="mode", action="store_const",
-    help="assume origin is a shortcut to a url")
+# Optional libraries are imported on first use (they are slow to import) and
+# then cached. The original ImportError is raised if the library isn't
+# installed so callers can re-raise it as is.
+@cache
+def import_requests():
+    import requests
+    return requests
+
+@cache
+def import_beautifulsoup():
+    from bs4 import BeautifulSoup
+    return BeautifulSoup
+
+# Return a requests session shared by all requests so that connections to the
+# forms server are reused. Cookies are rejected so nothing set by the convert
+# GET (or a previous submission) is sent with later POSTs, just like separate
+# requests. (Requires requests to be installed.)
+@cache
+def get_session():
+    from http.cookiejar import DefaultCookiePolicy
+    session = import_requests().Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+# Return the command line parser. It's built on first use so that importing
+# this module doesn't pay for it.
+@cache
+def get_parser():
+    from argparse import ArgumentParser
+
+    # Better parser that allows you to specify converter origin type.
+    # (Whether it's a file or a shortcut)
+    parser = ArgumentParser(description="Automate Google Forms")
+    subparsers = parser.add_subparsers(dest="command", required=True,
+        description="All commands form.py supports")
+
+    # form process ...
+    processor = subparsers.add_parser("process", aliases=["p"],
+        help="process config file and send form response",
+        description="Process config file and send form response")
+    processor.add_argument("target", default="config.txt", nargs="?",
+        help="file to use process config from")
+
+    # form convert ...
+    converter = subparsers.add_parser("convert", aliases=["c"],
+        help="convert form into config file",
+        description="Convert form into config file")
+    converter.add_argument("origin",
+        help="origin file / url to convert from")
+    converter.add_argument("target", default="config.txt", nargs="?",
+        help="target file to write converted config to")
+
+    # form convert --...
+    modes = converter.add_mutually_exclusive_group()
+    modes.add_argument("-u", "--url", const="url",
+        dest="mode", action="store_const",
+        help="assume origin is a url")
+    modes.add_argument("-f", "--file",  const="file",
+        dest="mode", action="store_const",
+        help="assume origin is an html file")
+    modes.add_argument("-s", "--shortcut", const="shortcut",
+        dest="mode", action="store_const",
+        help="assume origin is a shortcut to a url")
+
+    return parser
 
 # Get and convert the form HTML
 def get_html_from_convert(origin, mode):
@@ -56,7 +87,7 @@ def get_html_from_convert(origin, mode):
         url = origin
 
     try:
-        import requests
+        import_requests()
     except ImportError:
         print("Form cannot be converted (missing requests library)")
         sys.exit(3)
@@ -65,38 +96,47 @@ def get_html_from_convert(origin, mode):
     # -viewform URL doesn't have the form ready immediately but -formResponse
     # does. Maybe its something with the page loading or some JS trickery.
     url = to_form_url(url)
-    response = requests.get(url)
+    response = get_session().get(url)
     return response.text
 
 # Return what command should be run with target
 def get_target_command(target):
+    # Cheap checks before probing the file. Config files are usually .txt and
+    # a file ending with .html could be a downloaded form.
+    with suppress(ValueError):
+        to_form_url(target)
+        return "convert"
+    if target.endswith(".txt"):
+        return "process"
+    if target.endswith(".html") and os.path.isfile(target):
+        return "convert"
+
     try:
         # Raises error if not convertable (get_convert_mode)
         mode = get_convert_mode(target)
     except ValueError:
         return "process"
 
+    # Shortcuts are converted. Other files are config files.
     if mode != "file":
         return "convert"
-
-    # If the target ends with .html, it could be a downloaded form
-    if target.endswith(".html"):
-        return "convert"
     else:
         return "process"
 
-# Return convert mode that could be used on origin
+# Return convert mode that could be used on origin. Results are cached as a
+# simple run detects the mode and then convert detects it again. (Use
+# get_convert_mode.cache_clear() if the file could have changed.)
+@lru_cache(maxsize=128)
 def get_convert_mode(origin):
     with suppress(ValueError):
         to_form_url(origin)
         return "url"
     # Put after checking URL so we can use FileNotFoundError instead of OSError
-    with suppress(FileNotFoundError, ConfigError, KeyError):
+    with suppress(FileNotFoundError, KeyError):
         url_from_shortcut(origin)
         return "shortcut"
     # Put after shortcut because "file" includes "shortcut"
-    with suppress(FileNotFoundError):
-        open(origin).close()
+    if os.path.isfile(origin):  # A stat is cheaper than opening the file
         return "file"
     raise ValueError(f"Origin's mode couldn't be detected: {origin}")
 
@@ -134,7 +174,7 @@ def process(target="config.txt", *, command_line=False, should_submit=None):
 
     # Used to send the form response
     try:
-        import requests
+        import_requests()
     except ImportError:
         if not command_line:
             raise
@@ -148,10 +188,32 @@ def process(target="config.txt", *, command_line=False, should_submit=None):
 
     # Send POST request to the URL
     print_("Submitting form...")
-    response = requests.post(config.url, data=data)
+    response = get_session().post(config.url, data=data)
     print_(f"Response received: {response.status_code} {response.reason}")
     return response
 
+# Process many target files and submit all of them, returning the responses in
+# the same order. Prompts are asked one file at a time first, then the form
+# responses are sent concurrently from `max_workers` threads so that the
+# network waits overlap.
+def process_many(targets, *, max_workers=8):
+    requests = import_requests()  # Raises ImportError if not installed
+
+    submissions = []
+    for target in targets:
+        config = open_config(target)
+        messages = parse_entries(config.entries, on_prompt=prompt_entry)
+        data = format_entries(config.entries, messages)
+        submissions.append((config.url, data))
+
+    # Sessions aren't thread-safe so each request gets its own connection
+    from concurrent.futures import ThreadPoolExecutor
+    def submit(submission):
+        url, data = submission
+        return requests.post(url, data=data)
+    with ThreadPoolExecutor(max_workers) as executor:
+        return list(executor.map(submit, submissions))
+
 # Convert origin into a config file and save it to target. If `mode` isn't
 # specified, detect it using get_convert_mode. `command_line` specifies if
 # printing is allowed and if errors are converted into sys.exit.
@@ -166,14 +228,17 @@ def convert(
     else:
         print_ = print
 
-    # Used to parse the HTML
+    # Used to parse the HTML. This is imported here (with the convert module)
+    # so that processing a config file doesn't have to load it.
     try:
-        from bs4 import BeautifulSoup
+        BeautifulSoup = import_beautifulsoup()
     except ImportError:
         if not command_line:
             raise
         print_("Form cannot be converted (missing beautifulsoup4 library)")
         sys.exit(3)
+    from convert import HTML_PARSER, form_info, form_info_from_html
+    from convert import config_lines_from_info
 
     # Get the origin mode. This is before checking target because origin comes
     # before target in the command: `convert origin [target]`
@@ -182,10 +247,10 @@ def convert(
 
     # Check if config file can be written to
     try:
-        with open(target) as file:
-            if not file.read(1):
-                raise FileNotFoundError  # File can be written to
+        empty = not os.stat(target).st_size
     except FileNotFoundError:
+        empty = True
+    if empty:
         print_(f"Target file doesn't exist or is empty: {target}")
     # File exists and not empty
     else:
@@ -203,24 +268,34 @@ def convert(
     text = get_html_from_convert(origin, mode)
 
     print_("Converting form...")
-    soup = BeautifulSoup(text, "html.parser")
-    info = form_info(soup)
+    # Parsing the HTML is slow and only needed when the info can't be found
+    # from the text directly
+    if (info := form_info_from_html(text)) is None:
+        soup = BeautifulSoup(text, HTML_PARSER)
+        info = form_info(soup)
 
     # Write the info to the config file
     print_(f"Writing to config file: {target}")
+    text = "".join(f"{line}\n" for line in config_lines_from_info(info))
     with open(target, mode="w") as file:
-        for line in config_lines_from_info(info):
-            file.write(line + "\n")
+        file.write(text)  # Written in one go
 
     print_(f"Form converted and written to file: {target}")
 
+# Command names (with aliases) and the arguments that aren't simple runs
+PROCESS_COMMANDS = frozenset({"process", "p"})
+CONVERT_COMMANDS = frozenset({"convert", "c"})
+NOT_SIMPLE_ARGS = (
+    frozenset({"--help", "-h"}) | PROCESS_COMMANDS | CONVERT_COMMANDS
+)
+
 # Pass in sys.argv[1:]. Returns whether the program was run using a double
 # click of drag and dropped on.
 def is_simple_run(argv):
     if len(argv) == 0:  # Double click
         return True
     if len(argv) == 1:  # Drag and dropped file is argument
-        if argv[0] not in "--help -h process p convert c".split():
+        if argv[0] not in NOT_SIMPLE_ARGS:
             return True
     return False
 
@@ -233,9 +308,9 @@ def convert_simple_argv(argv):
         return [get_target_command(argv[0]), argv[0]]
 
 def main(args):
-    if args.command in "process p".split():
+    if args.command in PROCESS_COMMANDS:
         return process(args.target, command_line=True)
-    if args.command in "convert c".split():
+    if args.command in CONVERT_COMMANDS:
         return convert(args.origin, args.target, args.mode, command_line=True)
     raise ValueError(f"Unknown command: {args.command}")
 
@@ -245,7 +320,7 @@ if __name__ == "__main__":
     try:
         if simple_run:
             argv = convert_simple_argv(argv)
-        args = parser.parse_args(argv)
+        args = get_parser().parse_args(argv)
         main(args)
     except (KeyboardInterrupt, EOFError):
         pass  # Ignore Ctrl+C / Ctrl+Z
@@ -3,7 +3,7 @@
 # This module holds functions specifically for parsing config values and for
 # returning formatted data dictionaries.
 
-from datetime import date, time, datetime
+import re
 
 # - Prompts
 
@@ -21,8 +21,9 @@ def prompt_entry(entry):
     Prompt for a value to the passed entry.
     """
     assert entry.prompt
+    prompt = f"{entry.title}: {PROMPTS[entry.type]} "  # Same for each retry
     while True:
-        value = input(f"{entry.title}: {PROMPTS[entry.type]} ").strip()
+        value = input(prompt).strip()
         if not value:
             if entry.required and not entry.value:
                 print(f"Value for entry '{entry.title}' is required")
@@ -45,27 +46,54 @@ def parse_normal(value):
     return value
 
 def parse_checkboxes(value):
-    messages = list(map(str.strip, value.split(",")))
-    if not all(messages):
-        raise ValueError(f"Empty choice in value: {value}")
+    # Strip and check each choice in one pass
+    messages = []
+    for message in value.split(","):
+        if not (message := message.strip()):
+            raise ValueError(f"Empty choice in value: {value}")
+        messages.append(message)
     return messages
 
+# Fixed width formats (MM/DD/YYYY and HH:MM)
+DATE_PATTERN = re.compile(r"([0-9]{2})/([0-9]{2})/([0-9]{4})")
+TIME_PATTERN = re.compile(r"([0-9]{2}):([0-9]{2})")
+
+# Number of days in each month (February is checked separately)
+MONTH_DAYS = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
 def parse_date(value):
     if value in {"current", "today"}:
-        value = date.today().strftime("%m/%d/%Y")
-    month, day, year = value.split("/")
-    if len(month) != 2 or len(day) != 2 or len(year) != 4:
+        from datetime import date  # Only needed here
+        today = date.today()  # Always valid so no need to check it
+        return [f"{today.month:02}", f"{today.day:02}", f"{today.year:04}"]
+    if not (match := DATE_PATTERN.fullmatch(value)):
         raise ValueError("Incorrect date format: MM/DD/YYYY")
-    date(int(year), int(month), int(day))  # Check if date is real
+    month, day, year = match.groups()
+    # Check if date is real (cheaper than making a date object)
+    m, d, y = int(month), int(day), int(year)
+    if not 1 <= y <= 9999:
+        raise ValueError(f"year {y} is out of range")
+    if not 1 <= m <= 12:
+        raise ValueError("month must be in 1..12")
+    if not 1 <= d <= MONTH_DAYS[m - 1]:
+        raise ValueError("day is out of range for month")
+    if m == 2 and d == 29 and (y % 4 or (not y % 100 and y % 400)):
+        raise ValueError("day is out of range for month")  # Not a leap year
     return [month, day, year]
 
 def parse_time(value):
     if value in {"current", "now"}:
-        value = datetime.now().strftime("%H:%M")
-    hour, minute = value.split(":")
-    if len(hour) != 2 or len(minute) != 2:
+        from datetime import datetime  # Only needed here
+        now = datetime.now()  # Always valid so no need to check it
+        return [f"{now.hour:02}", f"{now.minute:02}"]
+    if not (match := TIME_PATTERN.fullmatch(value)):
         raise ValueError("Incorrect time format: HH:MM")
-    time(int(hour), int(minute))  # Check if time is real
+    hour, minute = match.groups()
+    # Check if time is real (cheaper than making a time object)
+    if not 0 <= int(hour) <= 23:
+        raise ValueError("hour must be in 0..23")
+    if not 0 <= int(minute) <= 59:
+        raise ValueError("minute must be in 0..59")
     return [hour, minute]
 
 PARSERS = {
@@ -108,23 +136,38 @@ def parse_entries(entries, *, on_prompt=prompt_entry):
 
 # - Formatters
 
-# Specialized functions (key, message -> dict[str, str])
-def format_normal(key, message):
-    return {f"entry.{key}": message}
+# Return the form field name of an entry (extra data has no "entry." prefix)
+def field_name(key, type):
+    return key if type == "extra" else f"entry.{key}"
 
-def format_sentinel(key, message):
-    return {f"entry.{key}": message, f"entry.{key}_sentinel": ""}
+# Specialized functions (data, name, message -> None). They add the formatted
+# message into the data dict directly so no dict is made per entry. `name` is
+# the entry's field name (see field_name). Suffixes are added with + as it's
+# a bit faster than an f-string here.
+def format_normal(data, name, message):
+    data[name] = message
 
-def format_date(key, message):
-    keys = [f"entry.{key}_month", f"entry.{key}_day", f"entry.{key}_year"]
-    return dict(zip(keys, message))
+def format_sentinel(data, name, message):
+    data[name] = message
+    data[name + "_sentinel"] = ""
 
-def format_time(key, message):
-    keys = [f"entry.{key}_hour", f"entry.{key}_minute"]
-    return dict(zip(keys, message))
+def format_date(data, name, message):
+    if not message:
+        return  # Optional entry that was left empty
+    month, day, year = message
+    data[name + "_month"] = month
+    data[name + "_day"] = day
+    data[name + "_year"] = year
 
-def format_extra(key, message):
-    return {key: message}
+def format_time(data, name, message):
+    if not message:
+        return  # Optional entry that was left empty
+    hour, minute = message
+    data[name + "_hour"] = hour
+    data[name + "_minute"] = minute
+
+# Extra data is sent as is (its name is the key)
+format_extra = format_normal
 
 # General formatting function (uses a `type` argument)
 FORMATS = {
@@ -146,16 +189,74 @@ def format_message(key, type, message):
     message from the parser functions. Don't give a string from parse_words to
     format_time.
     """
-    return FORMATS[type](key, message)
+    data = {}
+    FORMATS[type](data, field_name(key, type), message)
+    return data
 
-def format_entries(entries, messages):
+def format_entries(entries, messages, *, data=None):
     """
     Return a dictionary to be POSTed to the form.
 
     Format and merge the entries to create a data dictionary containing entries
     and other data. The result should be POSTed to a URL as the data argument.
+
+    If data is passed, it is cleared and reused instead of making a new dict.
+    This is useful when submitting the same form many times.
     """
-    data = {}
+    if data is None:
+        data = {}
+    else:
+        data.clear()
     for entry, message in zip(entries, messages):
-        data |= format_message(entry.key, entry.type, message)
+        FORMATS[entry.type](data, field_name(entry.key, entry.type), message)
     return data
+
+def make_formatter(entries):
+    """
+    Return a function like format_entries for these entries only.
+
+    The formatter and field name of each entry are looked up once here instead
+    of on every call, so changes to the entries afterwards aren't seen. The
+    returned function takes the messages (and optionally `data`) and is useful
+    when submitting the same form many times.
+    """
+    steps = [
+        (FORMATS[entry.type], field_name(entry.key, entry.type))
+        for entry in entries
+    ]
+    def format_messages(messages, *, data=None):
+        if data is None:
+            data = {}
+        else:
+            data.clear()
+        for (format, name), message in zip(steps, messages):
+            format(data, name, message)
+        return data
+    return format_messages
+
+# - Tests
+
+def test_parse_date():
+    assert parse_date("02/29/2020") == ["02", "29", "2020"]
+    assert parse_date("12/31/1999") == ["12", "31", "1999"]
+    for value in [
+        "02/29/2100", "02/30/2000", "04/31/2021", "13/01/2021", "+1/01/2021",
+    ]:
+        try:
+            parse_date(value)
+        except ValueError:
+            pass
+        else:
+            assert False, f"Date should be invalid: {value}"
+
+def test_make_formatter():
+    from config import EntryInfo
+    entries = [
+        EntryInfo(False, False, "words", "1", "Words", "a"),
+        EntryInfo(False, False, "choice", "2", "Choice", "b"),
+        EntryInfo(False, False, "date", "3", "Date", "01/02/2003"),
+        EntryInfo(False, False, "extra", "emailAddress", "Email", "c"),
+    ]
+    messages = parse_entries(entries)
+    data = format_entries(entries, messages)
+    assert make_formatter(entries)(messages) == data
@@ -2,10 +2,12 @@
 #
 # This module holds utility functions. (Mostly URL stuff.)
 
-from configparser import ConfigParser
-from string import ascii_letters, digits
+import re
 
-ID_CHARS = set(ascii_letters + digits + "-_")  # [a-zA-Z0-9_-]
+from functools import lru_cache
+
+ID_PATTERN = re.compile(r"[a-zA-Z0-9_-]*")
+@lru_cache(maxsize=256)
 def to_form_url(string):
     """
     Return a URL that can be POSTed to.
@@ -14,9 +16,12 @@ def to_form_url(string):
     returned. If the string is the GET URL (ends in viewform), it will be
     converted into a POST URL. If the string is the form's ID, it will be
     substituted into a URL.
+
+    Results are cached as this is called on the same strings repeatedly (such
+    as when detecting the convert mode).
     """
     string = string.strip()
-    if set(string) <= ID_CHARS:
+    if ID_PATTERN.fullmatch(string):
         if len(string) != 56:
             raise ValueError("Form ID not 56 characters long")
         return f"https://docs.google.com/forms/d/e/{string}/formResponse"
@@ -26,6 +31,7 @@ def to_form_url(string):
         return string.removesuffix("viewform") + "formResponse"
     raise ValueError(f"String cannot be converted into form link: {string}")
 
+@lru_cache(maxsize=256)
 def to_normal_form_url(string):
     """
     Return a URL that can be GETted.
@@ -33,13 +39,66 @@ def to_normal_form_url(string):
     Same rules as to_form_url. The result ends with viewform instead of
     formResponse.
     """
-    return to_form_url(string).removesuffix("formResponse") + "viewform"
+    # to_form_url always ends with formResponse so it can be sliced off
+    return f"{to_form_url(string)[:-len('formResponse')]}viewform"
 
+# Matches the URL in a shortcut's [InternetShortcut] section
+SHORTCUT_URL_PATTERN = re.compile(
+    r"^\[InternetShortcut\]\s*$[^\[]*?^(?i:URL)[ \t]*=[ \t]*(.*?)\s*$",
+    re.MULTILINE,
+)
 def url_from_shortcut(filename):
     """
     Return the URL from an internet shortcut.
+
+    The URL is found using a regex. Files that don't have an [InternetShortcut]
+    section (or that can't be read) raise a KeyError. Unusual shortcuts that
+    the regex doesn't match are read using a ConfigParser instead.
     """
-    shortcut = ConfigParser()
     with open(filename) as file:  # The file must exist
-        shortcut.read_file(file)
-    return shortcut["InternetShortcut"]["URL"]
+        text = file.read()
+    if match := SHORTCUT_URL_PATTERN.search(text):
+        return match[1]
+    if "[InternetShortcut]" not in text:
+        raise KeyError("InternetShortcut")
+    from configparser import ConfigParser, Error  # Rarely needed
+    # No interpolation so the URL is returned as written (like the regex)
+    shortcut = ConfigParser(interpolation=None)
+    try:
+        shortcut.read_string(text, source=filename)
+        return shortcut["InternetShortcut"]["URL"]
+    except Error as e:
+        raise KeyError("InternetShortcut") from e
+
+# - Tests
+
+def test_url_from_shortcut():
+    import os
+    from tempfile import TemporaryDirectory
+
+    url = "https://docs.google.com/forms/d/e/x/viewform?x=%20"
+    with TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "form.url")
+        # The first one uses the regex and the second uses ConfigParser
+        for text in [
+            f"[InternetShortcut]\nURL={url}\n",
+            f"[InternetShortcut]\nURL: {url}\n",
+        ]:
+            with open(filename, "w") as file:
+                file.write(text)
+            assert url_from_shortcut(filename) == url
+
+        # Files that aren't shortcuts (or can't be read) raise KeyError
+        for text in [
+            "config.txt\n",
+            "[InternetShortcut]\nnot a key value pair\n",
+            "[InternetShortcut]\nIDList=\n",
+        ]:
+            with open(filename, "w") as file:
+                file.write(text)
+            try:
+                url_from_shortcut(filename)
+            except KeyError:
+                pass
+            else:
+                assert False, f"Shortcut should be invalid: {text!r}"